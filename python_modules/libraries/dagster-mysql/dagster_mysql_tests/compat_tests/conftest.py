@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+from typing import Dict, NamedTuple, Sequence, Tuple
+from urllib.parse import urlparse
+
+import pytest
+import sqlalchemy as db
+from dagster._utils import file_relative_path
+from dagster_mysql.utils import get_conn_string
+from filelock import FileLock
+
+# each pytest-xdist worker reconstructs snapshots into its own schemas, so that workers can run
+# back-compat tests concurrently against the same MySQL instance
+_WORKER = os.environ.get("PYTEST_XDIST_WORKER", "master")
+_SCHEMA = f"test_{_WORKER}"
+
+with open(file_relative_path(__file__, "dagster.yaml"), encoding="utf8") as template_fd:
+    _DAGSTER_YAML_TEMPLATE = template_fd.read()
+
+
+def _root_conn_string(conn_string):
+    parse_result = urlparse(conn_string)
+    return get_conn_string(
+        username="root",
+        password="test",
+        hostname=parse_result.hostname,
+        db_name=parse_result.path[1:],
+        port=parse_result.port,
+    )
+
+
+def _execute(engine, *statements):
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _fetchone(engine, statement):
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(statement)
+        return cursor.fetchone()
+    finally:
+        conn.close()
+
+
+def _read_statements(dump):
+    # mysqldump escapes newlines within string literals, so statements can only end at a line end
+    lines = []
+    for raw_line in dump:
+        line = raw_line.rstrip(b"\n")
+        if not line or line.startswith(b"--"):
+            continue
+        if line.endswith(b";"):
+            lines.append(line[:-1])
+            yield b"\n".join(lines)
+            lines = []
+        else:
+            lines.append(line)
+    if lines:
+        yield b"\n".join(lines)
+
+
+# statements that do nothing when replaying into a freshly created schema on a single connection:
+# there are no tables to drop, no other sessions to lock out, and DISABLE KEYS is a no-op on InnoDB
+_NO_OP_STATEMENT_PREFIXES = (
+    b"DROP TABLE IF EXISTS ",
+    b"LOCK TABLES ",
+    b"UNLOCK TABLES",
+    b"/*!40000 ALTER TABLE ",
+)
+
+
+class _SnapshotTemplate(NamedTuple):
+    schema: str
+    # (table name, CREATE TABLE statement) for each table in the template schema
+    tables: Sequence[Tuple[str, str]]
+
+
+def _replay_dump(engine, path, schema) -> _SnapshotTemplate:
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"DROP SCHEMA IF EXISTS `{schema}`")
+        cursor.execute(f"CREATE SCHEMA `{schema}`")
+        cursor.execute(f"USE `{schema}`")
+        cursor.execute("SET SESSION autocommit=0, unique_checks=0, foreign_key_checks=0")
+        with open(path, "rb") as dump:
+            for statement in _read_statements(dump):
+                if not statement.startswith(_NO_OP_STATEMENT_PREFIXES):
+                    cursor.execute(statement)
+        cursor.execute("COMMIT")
+        cursor.execute("SET SESSION unique_checks=DEFAULT, foreign_key_checks=DEFAULT")
+
+        # templates never change once replayed, so their DDL is read once here rather than on
+        # every clone
+        cursor.execute("SHOW TABLES")
+        tables = []
+        for table_name in [row[0] for row in cursor.fetchall()]:
+            cursor.execute(f"SHOW CREATE TABLE `{table_name}`")
+            tables.append((table_name, cursor.fetchone()[1]))
+    finally:
+        conn.close()
+
+    return _SnapshotTemplate(schema, tables)
+
+
+def _clone_schema(engine, template: _SnapshotTemplate, target):
+    # CREATE TABLE ... LIKE drops foreign keys, so recreate each table from its full DDL instead
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"DROP SCHEMA IF EXISTS `{target}`")
+        cursor.execute(f"CREATE SCHEMA `{target}`")
+        cursor.execute(f"USE `{target}`")
+        cursor.execute("SET SESSION foreign_key_checks=0, sql_mode='NO_AUTO_VALUE_ON_ZERO'")
+        for table_name, create_statement in template.tables:
+            cursor.execute(create_statement)
+            cursor.execute(
+                f"INSERT INTO `{target}`.`{table_name}` "
+                f"SELECT * FROM `{template.schema}`.`{table_name}`"
+            )
+        conn.commit()
+        cursor.execute("SET SESSION foreign_key_checks=DEFAULT, sql_mode=DEFAULT")
+    finally:
+        conn.close()
+
+
+@pytest.fixture(scope="session")
+def root_engine(conn_string):
+    # pooled, so that replaying and cloning snapshots reuses a single authenticated connection
+    engine = db.create_engine(_root_conn_string(conn_string), pool_size=1)
+    # the test user only has access to the `test` schema by default. Grant (and later revoke) just
+    # this worker's schema, since other xdist workers share the server and are still using theirs.
+    # `_` is a wildcard in grant database names, so escape it to match the schema exactly
+    grant_schema = _SCHEMA.replace("_", "\\_")
+    _execute(engine, f"GRANT ALL PRIVILEGES ON `{grant_schema}`.* TO 'test'@'%'")
+    yield engine
+    _execute(engine, f"REVOKE ALL PRIVILEGES ON `{grant_schema}`.* FROM 'test'@'%'")
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def tune_mysql(root_engine, tmp_path_factory):
+    """Relaxes InnoDB and binlog durability, which dominate the cost of replaying snapshot dumps,
+    for the duration of the run. The test MySQL instance is disposable, so losing the last second
+    of commits on a crash does not matter.
+
+    pytest-xdist workers share the server, so the previous settings are captured by the first
+    worker to start and restored by the last one to finish, coordinated through a file in the
+    run's shared temporary directory.
+
+    Requested by snapshot_templates rather than used automatically, so that tests which never
+    replay a dump do not need a MySQL server.
+
+    Only dynamic variables can be set from here. When starting a MySQL instance just for these
+    tests, also pass --skip-log-bin, --innodb-doublewrite=OFF and --innodb-buffer-pool-size=1G.
+    """
+    state_dir = tmp_path_factory.getbasetemp()
+    if _WORKER != "master":
+        # each worker's base temp directory is a child of the one shared by the whole run
+        state_dir = state_dir.parent
+    state_path = state_dir / "tune_mysql.json"
+    lock = FileLock(str(state_dir / "tune_mysql.lock"))
+
+    with lock:
+        if state_path.exists():
+            state = json.loads(state_path.read_text(encoding="utf8"))
+        else:
+            flush_log_at_trx_commit, sync_binlog = _fetchone(
+                root_engine,
+                "SELECT @@GLOBAL.innodb_flush_log_at_trx_commit, @@GLOBAL.sync_binlog",
+            )
+            state = {
+                "workers": 0,
+                "innodb_flush_log_at_trx_commit": int(flush_log_at_trx_commit),
+                "sync_binlog": int(sync_binlog),
+            }
+            _execute(
+                root_engine,
+                "SET GLOBAL innodb_flush_log_at_trx_commit=2",
+                "SET GLOBAL sync_binlog=0",
+            )
+        state["workers"] += 1
+        state_path.write_text(json.dumps(state), encoding="utf8")
+
+    yield
+
+    with lock:
+        state = json.loads(state_path.read_text(encoding="utf8"))
+        state["workers"] -= 1
+        if state["workers"]:
+            state_path.write_text(json.dumps(state), encoding="utf8")
+        else:
+            _execute(
+                root_engine,
+                f"SET GLOBAL innodb_flush_log_at_trx_commit={state['innodb_flush_log_at_trx_commit']}",
+                f"SET GLOBAL sync_binlog={state['sync_binlog']}",
+            )
+            state_path.unlink()
+
+
+@pytest.fixture(scope="session")
+def snapshot_templates(root_engine, tune_mysql):
+    """Template schemas, keyed by snapshot path. Each snapshot dump is replayed into its template
+    schema at most once per session, the first time a test reconstructs from it.
+    """
+    templates: Dict[str, _SnapshotTemplate] = {}
+    yield templates
+    _execute(
+        root_engine,
+        *(f"DROP SCHEMA IF EXISTS `{template.schema}`" for template in templates.values()),
+    )
+
+
+@pytest.fixture(scope="session")
+def reconstruct_snapshot(root_engine, snapshot_templates):
+    """Returns a function that reconstructs a snapshot into this worker's test schema, by cloning
+    the snapshot's template schema.
+    """
+
+    def _reconstruct(path):
+        if path not in snapshot_templates:
+            schema = f"tpl_{_WORKER}_{hashlib.sha1(path.encode('utf8')).hexdigest()}"
+            snapshot_templates[path] = _replay_dump(root_engine, path, schema)
+        _clone_schema(root_engine, snapshot_templates[path], _SCHEMA)
+
+    yield _reconstruct
+    _execute(root_engine, f"DROP SCHEMA IF EXISTS `{_SCHEMA}`")
+
+
+@pytest.fixture(scope="session")
+def dagster_yaml_dir(conn_string, tmp_path_factory):
+    """A directory holding a dagster.yaml that points every storage at this worker's test schema."""
+    parse_result = urlparse(conn_string)
+    path = tmp_path_factory.mktemp("dagster_home")
+    (path / "dagster.yaml").write_text(
+        _DAGSTER_YAML_TEMPLATE.format(
+            hostname=parse_result.hostname, port=parse_result.port, db_name=_SCHEMA
+        ),
+        encoding="utf8",
+    )
+    return str(path)
@@ -1,9 +1,9 @@
 # ruff: noqa: SLF001
 import datetime
+import glob
 import os
-import subprocess
-import tempfile
-from urllib.parse import urlparse
+import re
+from typing import Mapping, NamedTuple, Optional, Sequence, Set
 
 import pytest
 import sqlalchemy as db
@@ -17,61 +17,77 @@
 from dagster._core.storage.event_log.migration import ASSET_KEY_INDEX_COLS
 from dagster._core.storage.migration.bigint_migration import run_bigint_migration
 from dagster._core.storage.runs.migration import BACKFILL_JOB_NAME_AND_TAGS, RUN_BACKFILL_ID
-from dagster._core.storage.sqlalchemy_compat import db_select
+from dagster._core.storage.schedules.migration import SCHEDULE_JOBS_SELECTOR_ID
+from dagster._core.storage.schedules.schema import InstigatorsTable, JobTable, JobTickTable
+from dagster._core.storage.sqlalchemy_compat import db_scalar_subquery, db_select
 from dagster._core.storage.tags import BACKFILL_ID_TAG
 from dagster._core.utils import make_new_run_id
 from dagster._daemon.types import DaemonHeartbeat
 from dagster._time import get_current_timestamp
 from dagster._utils import file_relative_path
 
+from dagster_mysql_tests.compat_tests.conftest import _NO_OP_STATEMENT_PREFIXES, _read_statements
 
-def get_columns(instance, table_name: str):
-    with instance.run_storage.connect() as conn:
-        return set(c["name"] for c in db.inspect(conn).get_columns(table_name))
+# read names straight from information_schema, rather than through SQLAlchemy reflection, which
+# builds (and then discards) full column and index descriptions
+_TABLE_NAMES_QUERY = (
+    "SELECT table_name FROM information_schema.tables"
+    " WHERE table_schema = DATABASE() AND table_type = 'BASE TABLE'"
+)
+_COLUMN_NAMES_QUERY = (
+    "SELECT table_name, column_name FROM information_schema.columns"
+    " WHERE table_schema = DATABASE()"
+)
+_INDEX_NAMES_QUERY = (
+    "SELECT DISTINCT table_name, index_name FROM information_schema.statistics"
+    " WHERE table_schema = DATABASE() AND index_name != 'PRIMARY'"
+)
 
 
-def get_indexes(instance, table_name: str):
+def get_columns(instance, table_name: str):
     with instance.run_storage.connect() as conn:
-        return set(i["name"] for i in db.inspect(conn).get_indexes(table_name))
+        rows = conn.execute(
+            db.text(f"{_COLUMN_NAMES_QUERY} AND table_name = :table_name"),
+            {"table_name": table_name},
+        )
+        return {row[1] for row in rows}
 
 
 def get_tables(instance):
     with instance.run_storage.connect() as conn:
-        return db.inspect(conn).get_table_names()
-
-
-def _reconstruct_from_file(conn_string, path, _username="root", _password="test"):
-    parse_result = urlparse(conn_string)
-    hostname = parse_result.hostname
-    port = parse_result.port
-    engine = db.create_engine(conn_string)
-    with engine.connect() as conn:
-        with conn.begin():
-            conn.execute(db.text("drop schema test;"))
-            conn.execute(db.text("create schema test;"))
-    env = os.environ.copy()
-    env["MYSQL_PWD"] = "test"
-    subprocess.check_call(
-        f"mysql -uroot -h{hostname} -P{port} -ptest test < {path}", shell=True, env=env
-    )
-    return hostname, port
+        return {row[0] for row in conn.execute(db.text(_TABLE_NAMES_QUERY))}
 
 
-def test_0_13_17_mysql_convert_float_cols(conn_string):
-    hostname, port = _reconstruct_from_file(
-        conn_string,
+class SchemaSnapshot(NamedTuple):
+    tables: Set[str]
+    columns: Mapping[str, Set[str]]
+    indexes: Mapping[str, Set[str]]
+
+
+def get_schema(instance, table_names: Optional[Sequence[str]] = None) -> SchemaSnapshot:
+    """Reads the table names, and the column and index names of each of the given tables that
+    exists (or of every table, if none are given), with one query each over a single connection.
+    """
+    with instance.run_storage.connect() as conn:
+        tables = {row[0] for row in conn.execute(db.text(_TABLE_NAMES_QUERY))}
+        existing = tables if table_names is None else tables.intersection(table_names)
+        columns = {table_name: set() for table_name in existing}
+        for table_name, column_name in conn.execute(db.text(_COLUMN_NAMES_QUERY)):
+            if table_name in columns:
+                columns[table_name].add(column_name)
+        indexes = {table_name: set() for table_name in existing}
+        for table_name, index_name in conn.execute(db.text(_INDEX_NAMES_QUERY)):
+            if table_name in indexes:
+                indexes[table_name].add(index_name)
+        return SchemaSnapshot(tables=tables, columns=columns, indexes=indexes)
+
+
+def test_0_13_17_mysql_convert_float_cols(reconstruct_snapshot, dagster_yaml_dir):
+    reconstruct_snapshot(
         file_relative_path(__file__, "snapshot_0_13_18_start_end_timestamp.sql"),
     )
 
-    with tempfile.TemporaryDirectory() as tempdir:
-        with open(
-            file_relative_path(__file__, "dagster.yaml"), "r", encoding="utf8"
-        ) as template_fd:
-            with open(os.path.join(tempdir, "dagster.yaml"), "w", encoding="utf8") as target_fd:
-                template = template_fd.read().format(hostname=hostname, port=port)
-                target_fd.write(template)
-
-        instance = DagsterInstance.from_config(tempdir)
+    with DagsterInstance.from_config(dagster_yaml_dir) as instance:
         record = instance.get_run_records(limit=1)[0]
         assert int(record.start_time) == 1643760000
         assert int(record.end_time) == 1643760000
@@ -89,22 +105,12 @@ def test_0_13_17_mysql_convert_float_cols(conn_string):
         assert int(record.end_time) == 1643788834
 
 
-def test_instigators_table_backcompat(conn_string):
-    hostname, port = _reconstruct_from_file(
-        conn_string,
+def test_instigators_table_backcompat(reconstruct_snapshot, dagster_yaml_dir):
+    reconstruct_snapshot(
         file_relative_path(__file__, "snapshot_0_14_6_instigators_table.sql"),
     )
 
-    with tempfile.TemporaryDirectory() as tempdir:
-        with open(
-            file_relative_path(__file__, "dagster.yaml"), "r", encoding="utf8"
-        ) as template_fd:
-            with open(os.path.join(tempdir, "dagster.yaml"), "w", encoding="utf8") as target_fd:
-                template = template_fd.read().format(hostname=hostname, port=port)
-                target_fd.write(template)
-
-        instance = DagsterInstance.from_config(tempdir)
-
+    with DagsterInstance.from_config(dagster_yaml_dir) as instance:
         assert not instance.schedule_storage.has_instigators_table()
 
         instance.upgrade()
@@ -112,576 +118,492 @@ def test_instigators_table_backcompat(conn_string):
         assert instance.schedule_storage.has_instigators_table()
 
 
-def test_asset_observation_backcompat(conn_string):
-    hostname, port = _reconstruct_from_file(
-        conn_string,
-        file_relative_path(__file__, "snapshot_0_11_16_pre_add_asset_key_index_cols.sql"),
-    )
+@op
+def asset_op(_):
+    yield AssetObservation(asset_key=AssetKey(["a"]))
+    yield Output(1)
 
-    @op
-    def asset_op(_):
-        yield AssetObservation(asset_key=AssetKey(["a"]))
-        yield Output(1)
 
-    @job
-    def asset_job():
-        asset_op()
+@job
+def asset_observation_job():
+    asset_op()
 
-    with tempfile.TemporaryDirectory() as tempdir:
-        with open(
-            file_relative_path(__file__, "dagster.yaml"), "r", encoding="utf8"
-        ) as template_fd:
-            with open(os.path.join(tempdir, "dagster.yaml"), "w", encoding="utf8") as target_fd:
-                template = template_fd.read().format(hostname=hostname, port=port)
-                target_fd.write(template)
 
-        with DagsterInstance.from_config(tempdir) as instance:
-            storage = instance._event_storage
+def test_asset_observation_backcompat(reconstruct_snapshot, dagster_yaml_dir):
+    reconstruct_snapshot(
+        file_relative_path(__file__, "snapshot_0_11_16_pre_add_asset_key_index_cols.sql"),
+    )
 
-            assert not instance.event_log_storage.has_secondary_index(ASSET_KEY_INDEX_COLS)
+    with DagsterInstance.from_config(dagster_yaml_dir) as instance:
+        storage = instance._event_storage
 
-            asset_job.execute_in_process(instance=instance)
-            assert storage.has_asset_key(AssetKey(["a"]))
+        assert not instance.event_log_storage.has_secondary_index(ASSET_KEY_INDEX_COLS)
 
+        asset_observation_job.execute_in_process(instance=instance)
+        assert storage.has_asset_key(AssetKey(["a"]))
 
-def test_jobs_selector_id_migration(conn_string):
-    import sqlalchemy as db
-    from dagster._core.storage.schedules.migration import SCHEDULE_JOBS_SELECTOR_ID
-    from dagster._core.storage.schedules.schema import InstigatorsTable, JobTable, JobTickTable
 
-    hostname, port = _reconstruct_from_file(
-        conn_string,
+# built once, so that every execution reuses the same statement and its compiled form
+_INSTIGATOR_COUNT_QUERY = db_select([db.func.count()]).select_from(InstigatorsTable)
+_MIGRATED_JOB_COUNT_QUERY = (
+    db_select([db.func.count()]).select_from(JobTable).where(JobTable.c.selector_id.isnot(None))
+)
+_TICK_COUNT_QUERY = db_select([db.func.count()]).select_from(JobTickTable)
+_MIGRATED_TICK_COUNT_QUERY = (
+    db_select([db.func.count()])
+    .select_from(JobTickTable)
+    .where(JobTickTable.c.selector_id.isnot(None))
+)
+
+
+def test_jobs_selector_id_migration(reconstruct_snapshot, dagster_yaml_dir):
+    reconstruct_snapshot(
         file_relative_path(__file__, "snapshot_0_14_6_post_schema_pre_data_migration.sql"),
     )
 
-    with tempfile.TemporaryDirectory() as tempdir:
-        with open(
-            file_relative_path(__file__, "dagster.yaml"), "r", encoding="utf8"
-        ) as template_fd:
-            with open(os.path.join(tempdir, "dagster.yaml"), "w", encoding="utf8") as target_fd:
-                template = template_fd.read().format(hostname=hostname, port=port)
-                target_fd.write(template)
-
-        with DagsterInstance.from_config(tempdir) as instance:
-            # runs the required data migrations
-            instance.upgrade()
-
-            assert instance.schedule_storage.has_built_index(SCHEDULE_JOBS_SELECTOR_ID)
-            legacy_count = len(instance.all_instigator_state())
-            migrated_instigator_count = instance.schedule_storage.execute(
-                db_select([db.func.count()]).select_from(InstigatorsTable)
-            )[0][0]
+    with DagsterInstance.from_config(dagster_yaml_dir) as instance:
+        # runs the required data migrations
+        instance.upgrade()
+
+        assert instance.schedule_storage.has_built_index(SCHEDULE_JOBS_SELECTOR_ID)
+        legacy_count = len(instance.all_instigator_state())
+        with instance.schedule_storage.connect() as conn:
+            migrated_instigator_count = conn.execute(_INSTIGATOR_COUNT_QUERY).fetchone()[0]
             assert migrated_instigator_count == legacy_count
 
-            migrated_job_count = instance.schedule_storage.execute(
-                db_select([db.func.count()])
-                .select_from(JobTable)
-                .where(JobTable.c.selector_id.isnot(None))
-            )[0][0]
+            migrated_job_count = conn.execute(_MIGRATED_JOB_COUNT_QUERY).fetchone()[0]
             assert migrated_job_count == legacy_count
 
-            legacy_tick_count = instance.schedule_storage.execute(
-                db_select([db.func.count()]).select_from(JobTickTable)
-            )[0][0]
+            legacy_tick_count = conn.execute(_TICK_COUNT_QUERY).fetchone()[0]
             assert legacy_tick_count > 0
 
             # tick migrations are optional
-            migrated_tick_count = instance.schedule_storage.execute(
-                db_select([db.func.count()])
-                .select_from(JobTickTable)
-                .where(JobTickTable.c.selector_id.isnot(None))
-            )[0][0]
+            migrated_tick_count = conn.execute(_MIGRATED_TICK_COUNT_QUERY).fetchone()[0]
             assert migrated_tick_count == 0
 
-            # run the optional migrations
-            instance.reindex()
-
-            migrated_tick_count = instance.schedule_storage.execute(
-                db_select([db.func.count()])
-                .select_from(JobTickTable)
-                .where(JobTickTable.c.selector_id.isnot(None))
-            )[0][0]
-            assert migrated_tick_count == legacy_tick_count
-
-
-def test_add_bulk_actions_columns(conn_string):
-    new_columns = {"selector_id", "action_type"}
-    new_indexes = {"idx_bulk_actions_action_type", "idx_bulk_actions_selector_id"}
-
-    hostname, port = _reconstruct_from_file(
-        conn_string,
-        # use an old snapshot, it has the bulk actions table but not the new columns
-        file_relative_path(__file__, "snapshot_0_14_6_post_schema_pre_data_migration.sql"),
-    )
-
-    with tempfile.TemporaryDirectory() as tempdir:
-        with open(
-            file_relative_path(__file__, "dagster.yaml"), "r", encoding="utf8"
-        ) as template_fd:
-            with open(os.path.join(tempdir, "dagster.yaml"), "w", encoding="utf8") as target_fd:
-                template = template_fd.read().format(hostname=hostname, port=port)
-                target_fd.write(template)
-
-        with DagsterInstance.from_config(tempdir) as instance:
-            assert get_columns(instance, "bulk_actions") & new_columns == set()
-            assert get_indexes(instance, "bulk_actions") & new_indexes == set()
+        # run the optional migrations
+        instance.reindex()
 
-            instance.upgrade()
-            assert new_columns <= get_columns(instance, "bulk_actions")
-            assert new_indexes <= get_indexes(instance, "bulk_actions")
+        with instance.schedule_storage.connect() as conn:
+            migrated_tick_count = conn.execute(_MIGRATED_TICK_COUNT_QUERY).fetchone()[0]
+        assert migrated_tick_count == legacy_tick_count
 
 
-def test_add_kvs_table(conn_string):
-    hostname, port = _reconstruct_from_file(
-        conn_string,
-        # use an old snapshot
-        file_relative_path(__file__, "snapshot_0_14_6_post_schema_pre_data_migration.sql"),
-    )
+@pytest.fixture(scope="module")
+def upgraded_schema(request, reconstruct_snapshot, dagster_yaml_dir):
+    """The schema of a snapshot before and after upgrading it. Tests that only check the schema an
+    upgrade produces share this fixture, so each snapshot is reconstructed and upgraded once.
+    """
+    reconstruct_snapshot(file_relative_path(__file__, request.param))
+    with DagsterInstance.from_config(dagster_yaml_dir) as instance:
+        before = get_schema(instance)
+        instance.upgrade()
+        after = get_schema(instance)
+    return before, after
+
+
+@pytest.mark.parametrize(
+    "upgraded_schema, table_name, new_table, new_columns, new_indexes, dropped_indexes",
+    [
+        pytest.param(
+            # use an old snapshot, it has the bulk actions table but not the new columns
+            "snapshot_0_14_6_post_schema_pre_data_migration.sql",
+            "bulk_actions",
+            False,
+            {"selector_id", "action_type"},
+            {"idx_bulk_actions_action_type", "idx_bulk_actions_selector_id"},
+            set(),
+            id="add_bulk_actions_columns",
+        ),
+        pytest.param(
+            # use an old snapshot, it does not have the kvs table
+            "snapshot_0_14_6_post_schema_pre_data_migration.sql",
+            "kvs",
+            True,
+            {"key", "value"},
+            {"idx_kvs_keys_unique"},
+            set(),
+            id="add_kvs_table",
+        ),
+        pytest.param(
+            "snapshot_1_0_17_add_cached_status_data_column.sql",
+            "asset_keys",
+            False,
+            {"cached_status_data"},
+            set(),
+            set(),
+            id="add_cached_status_data_column",
+        ),
+        pytest.param(
+            "snapshot_1_8_12_pre_add_backfill_id_column_to_runs_table.sql",
+            "runs",
+            False,
+            # the backfill_id column is covered by test_add_backfill_id_column
+            set(),
+            {"idx_runs_by_backfill_id"},
+            set(),
+            id="add_runs_by_backfill_id_idx",
+        ),
+        pytest.param(
+            "snapshot_1_8_12_pre_add_backfill_id_column_to_runs_table.sql",
+            "run_tags",
+            False,
+            set(),
+            {"idx_run_tags_run_id"},
+            {"idx_run_tags"},
+            id="add_run_tags_run_id_idx",
+        ),
+    ],
+    indirect=["upgraded_schema"],
+)
+def test_upgrade_schema_changes(
+    upgraded_schema, table_name, new_table, new_columns, new_indexes, dropped_indexes
+):
+    before, after = upgraded_schema
+    assert (table_name not in before.tables) == new_table
+    assert before.columns.get(table_name, set()) & new_columns == set()
+    assert before.indexes.get(table_name, set()) & new_indexes == set()
+    assert dropped_indexes <= before.indexes.get(table_name, set())
 
-    with tempfile.TemporaryDirectory() as tempdir:
-        with open(
-            file_relative_path(__file__, "dagster.yaml"), "r", encoding="utf8"
-        ) as template_fd:
-            with open(os.path.join(tempdir, "dagster.yaml"), "w", encoding="utf8") as target_fd:
-                template = template_fd.read().format(hostname=hostname, port=port)
-                target_fd.write(template)
+    assert table_name in after.tables
+    assert new_columns <= after.columns[table_name]
+    assert new_indexes <= after.indexes[table_name]
+    assert after.indexes[table_name] & dropped_indexes == set()
 
-        with DagsterInstance.from_config(tempdir) as instance:
-            assert "kvs" not in get_tables(instance)
 
-            instance.upgrade()
-            assert "kvs" in get_tables(instance)
-            assert "idx_kvs_keys_unique" in get_indexes(instance, "kvs")
+@op
+def yields_materialization_w_tags(_):
+    yield AssetMaterialization(asset_key=AssetKey(["a"]), tags={DATA_VERSION_TAG: "bar"})
+    yield Output(1)
 
 
-def test_add_asset_event_tags_table(conn_string):
-    @op
-    def yields_materialization_w_tags(_):
-        yield AssetMaterialization(asset_key=AssetKey(["a"]), tags={DATA_VERSION_TAG: "bar"})
-        yield Output(1)
+@job
+def asset_event_tags_job():
+    yields_materialization_w_tags()
 
-    @job
-    def asset_job():
-        yields_materialization_w_tags()
 
-    hostname, port = _reconstruct_from_file(
-        conn_string,
+def test_add_asset_event_tags_table(reconstruct_snapshot, dagster_yaml_dir):
+    reconstruct_snapshot(
         # use an old snapshot
         file_relative_path(__file__, "snapshot_1_0_12_pre_add_asset_event_tags_table.sql"),
     )
 
-    with tempfile.TemporaryDirectory() as tempdir:
-        with open(
-            file_relative_path(__file__, "dagster.yaml"), "r", encoding="utf8"
-        ) as template_fd:
-            with open(os.path.join(tempdir, "dagster.yaml"), "w", encoding="utf8") as target_fd:
-                template = template_fd.read().format(hostname=hostname, port=port)
-                target_fd.write(template)
-
-        with DagsterInstance.from_config(tempdir) as instance:
-            assert "asset_event_tags" not in get_tables(instance)
-            asset_job.execute_in_process(instance=instance)
-            with pytest.raises(
-                DagsterInvalidInvocationError, match="In order to search for asset event tags"
-            ):
-                instance._event_storage.get_event_tags_for_asset(asset_key=AssetKey(["a"]))
-
-            instance.upgrade()
-            assert "asset_event_tags" in get_tables(instance)
-            asset_job.execute_in_process(instance=instance)
-            assert instance._event_storage.get_event_tags_for_asset(asset_key=AssetKey(["a"])) == [
-                {DATA_VERSION_TAG: "bar"}
-            ]
-
-            indexes = get_indexes(instance, "asset_event_tags")
-            assert "idx_asset_event_tags" in indexes
-            assert "idx_asset_event_tags_event_id" in indexes
-
-
-def test_add_cached_status_data_column(conn_string):
-    new_columns = {"cached_status_data"}
-
-    hostname, port = _reconstruct_from_file(
-        conn_string,
-        # use an old snapshot, it has the bulk actions table but not the new columns
-        file_relative_path(__file__, "snapshot_1_0_17_add_cached_status_data_column.sql"),
-    )
-
-    with tempfile.TemporaryDirectory() as tempdir:
-        with open(
-            file_relative_path(__file__, "dagster.yaml"), "r", encoding="utf8"
-        ) as template_fd:
-            with open(os.path.join(tempdir, "dagster.yaml"), "w", encoding="utf8") as target_fd:
-                template = template_fd.read().format(hostname=hostname, port=port)
-                target_fd.write(template)
+    with DagsterInstance.from_config(dagster_yaml_dir) as instance:
+        assert "asset_event_tags" not in get_tables(instance)
+        asset_event_tags_job.execute_in_process(instance=instance)
+        with pytest.raises(
+            DagsterInvalidInvocationError, match="In order to search for asset event tags"
+        ):
+            instance._event_storage.get_event_tags_for_asset(asset_key=AssetKey(["a"]))
 
-        with DagsterInstance.from_config(tempdir) as instance:
-            assert get_columns(instance, "asset_keys") & new_columns == set()
+        instance.upgrade()
+        schema = get_schema(instance, ["asset_event_tags"])
+        assert "asset_event_tags" in schema.tables
+        asset_event_tags_job.execute_in_process(instance=instance)
+        assert instance._event_storage.get_event_tags_for_asset(asset_key=AssetKey(["a"])) == [
+            {DATA_VERSION_TAG: "bar"}
+        ]
 
-            instance.upgrade()
-            assert new_columns <= get_columns(instance, "asset_keys")
+        assert "idx_asset_event_tags" in schema.indexes["asset_event_tags"]
+        assert "idx_asset_event_tags_event_id" in schema.indexes["asset_event_tags"]
 
 
-def test_add_dynamic_partitions_table(conn_string):
-    hostname, port = _reconstruct_from_file(
-        conn_string,
+def test_add_dynamic_partitions_table(reconstruct_snapshot, dagster_yaml_dir):
+    reconstruct_snapshot(
         file_relative_path(__file__, "snapshot_1_0_17_add_cached_status_data_column.sql"),
     )
 
-    with tempfile.TemporaryDirectory() as tempdir:
-        with open(
-            file_relative_path(__file__, "dagster.yaml"), "r", encoding="utf8"
-        ) as template_fd:
-            with open(os.path.join(tempdir, "dagster.yaml"), "w", encoding="utf8") as target_fd:
-                template = template_fd.read().format(hostname=hostname, port=port)
-                target_fd.write(template)
-
-        with DagsterInstance.from_config(tempdir) as instance:
-            assert "dynamic_partitions" not in get_tables(instance)
-
-            instance.wipe()
+    with DagsterInstance.from_config(dagster_yaml_dir) as instance:
+        assert "dynamic_partitions" not in get_tables(instance)
 
-            with pytest.raises(DagsterInvalidInvocationError, match="does not exist"):
-                instance.get_dynamic_partitions("foo")
+        instance.wipe()
 
-            instance.upgrade()
-            assert "dynamic_partitions" in get_tables(instance)
-            assert instance.get_dynamic_partitions("foo") == []
+        with pytest.raises(DagsterInvalidInvocationError, match="does not exist"):
+            instance.get_dynamic_partitions("foo")
 
+        instance.upgrade()
+        assert "dynamic_partitions" in get_tables(instance)
+        assert instance.get_dynamic_partitions("foo") == []
 
-def _get_table_row_count(run_storage, table, with_non_null_id=False):
-    import sqlalchemy as db
 
+def _row_count_query(table, with_non_null_id=False):
     query = db_select([db.func.count()]).select_from(table)
     if with_non_null_id:
         query = query.where(table.c.id.isnot(None))
-    with run_storage.connect() as conn:
-        row_count = conn.execute(query).fetchone()[0]
-    return row_count
+    return query
+
 
+def _get_table_row_counts(conn, tables, with_non_null_id=False):
+    """Counts the rows of each of the given tables, with a single query."""
+    query = db_select(
+        [db_scalar_subquery(_row_count_query(table, with_non_null_id)) for table in tables]
+    )
+    return tuple(conn.execute(query).fetchone())
 
-def test_add_primary_keys(conn_string):
+
+def test_add_primary_keys(reconstruct_snapshot, dagster_yaml_dir):
     from dagster._core.storage.runs.schema import (
         DaemonHeartbeatsTable,
         InstanceInfo,
         KeyValueStoreTable,
     )
 
-    hostname, port = _reconstruct_from_file(
-        conn_string,
+    reconstruct_snapshot(
         file_relative_path(__file__, "snapshot_1_1_22_pre_primary_key.sql"),
     )
 
-    with tempfile.TemporaryDirectory() as tempdir:
-        with open(
-            file_relative_path(__file__, "dagster.yaml"), "r", encoding="utf8"
-        ) as template_fd:
-            with open(os.path.join(tempdir, "dagster.yaml"), "w", encoding="utf8") as target_fd:
-                template = template_fd.read().format(hostname=hostname, port=port)
-                target_fd.write(template)
-
-        with DagsterInstance.from_config(tempdir) as instance:
-            assert "id" not in get_columns(instance, "kvs")
-            # trigger insert, and update
-            instance.run_storage.set_cursor_values({"a": "A"})
-            instance.run_storage.set_cursor_values({"a": "A"})
-
-            kvs_row_count = _get_table_row_count(instance.run_storage, KeyValueStoreTable)
-            assert kvs_row_count > 0
-
-            assert "id" not in get_columns(instance, "instance_info")
-            instance_info_row_count = _get_table_row_count(instance.run_storage, InstanceInfo)
-            assert instance_info_row_count > 0
-
-            assert "id" not in get_columns(instance, "daemon_heartbeats")
-            heartbeat = DaemonHeartbeat(
-                timestamp=datetime.datetime.now().timestamp(), daemon_type="test", daemon_id="test"
-            )
-            instance.run_storage.add_daemon_heartbeat(heartbeat)
-            instance.run_storage.add_daemon_heartbeat(heartbeat)
-            daemon_heartbeats_row_count = _get_table_row_count(
-                instance.run_storage, DaemonHeartbeatsTable
+    with DagsterInstance.from_config(dagster_yaml_dir) as instance:
+        schema = get_schema(instance, ["kvs", "instance_info", "daemon_heartbeats"])
+        assert "id" not in schema.columns["kvs"]
+        assert "id" not in schema.columns["instance_info"]
+        assert "id" not in schema.columns["daemon_heartbeats"]
+
+        # trigger insert, and update
+        instance.run_storage.set_cursor_values({"a": "A"})
+        instance.run_storage.set_cursor_values({"a": "A"})
+
+        heartbeat = DaemonHeartbeat(
+            timestamp=datetime.datetime.now().timestamp(), daemon_type="test", daemon_id="test"
+        )
+        instance.run_storage.add_daemon_heartbeat(heartbeat)
+        instance.run_storage.add_daemon_heartbeat(heartbeat)
+
+        with instance.run_storage.connect() as conn:
+            kvs_row_count, instance_info_row_count, daemon_heartbeats_row_count = (
+                _get_table_row_counts(
+                    conn, [KeyValueStoreTable, InstanceInfo, DaemonHeartbeatsTable]
+                )
             )
-            assert daemon_heartbeats_row_count > 0
+        assert kvs_row_count > 0
+        assert instance_info_row_count > 0
+        assert daemon_heartbeats_row_count > 0
 
-            instance.upgrade()
+        instance.upgrade()
 
-            assert "id" in get_columns(instance, "kvs")
-            with instance.run_storage.connect():
-                kvs_id_count = _get_table_row_count(
-                    instance.run_storage, KeyValueStoreTable, with_non_null_id=True
+        schema = get_schema(instance, ["kvs", "instance_info", "daemon_heartbeats"])
+        assert "id" in schema.columns["kvs"]
+        assert "id" in schema.columns["instance_info"]
+        assert "id" in schema.columns["daemon_heartbeats"]
+
+        with instance.run_storage.connect() as conn:
+            kvs_id_count, instance_info_id_count, daemon_heartbeats_id_count = (
+                _get_table_row_counts(
+                    conn,
+                    [KeyValueStoreTable, InstanceInfo, DaemonHeartbeatsTable],
+                    with_non_null_id=True,
                 )
-            assert kvs_id_count == kvs_row_count
+            )
+        assert kvs_id_count == kvs_row_count
+        assert instance_info_id_count == instance_info_row_count
+        assert daemon_heartbeats_id_count == daemon_heartbeats_row_count
 
-            assert "id" in get_columns(instance, "instance_info")
-            with instance.run_storage.connect():
-                instance_info_id_count = _get_table_row_count(
-                    instance.run_storage, InstanceInfo, with_non_null_id=True
-                )
-            assert instance_info_id_count == instance_info_row_count
 
-            assert "id" in get_columns(instance, "daemon_heartbeats")
-            with instance.run_storage.connect():
-                daemon_heartbeats_id_count = _get_table_row_count(
-                    instance.run_storage, DaemonHeartbeatsTable, with_non_null_id=True
-                )
-            assert daemon_heartbeats_id_count == daemon_heartbeats_row_count
+_INTEGER_ID_TABLES_QUERY = (
+    "SELECT table_name FROM information_schema.columns"
+    " WHERE table_schema = DATABASE() AND column_name = 'id' AND data_type = 'int'"
+)
+_NON_AUTOINCREMENT_ID_TABLES_QUERY = (
+    "SELECT table_name FROM information_schema.columns"
+    " WHERE table_schema = DATABASE() AND column_name = 'id'"
+    " AND INSTR(extra, 'auto_increment') = 0"
+)
 
 
-def test_bigint_migration(conn_string):
-    hostname, port = _reconstruct_from_file(
-        conn_string,
+def test_bigint_migration(reconstruct_snapshot, dagster_yaml_dir):
+    reconstruct_snapshot(
         file_relative_path(__file__, "snapshot_1_1_22_pre_primary_key.sql"),
     )
 
     def _get_integer_id_tables(conn):
-        inspector = db.inspect(conn)
-        integer_tables = set()
-        for table in inspector.get_table_names():
-            type_by_col_name = {c["name"]: c["type"] for c in db.inspect(conn).get_columns(table)}
-            id_type = type_by_col_name.get("id")
-            if id_type and str(id_type) == "INTEGER":
-                integer_tables.add(table)
-        return integer_tables
+        return {row[0] for row in conn.execute(db.text(_INTEGER_ID_TABLES_QUERY))}
 
     def _assert_autoincrement_id(conn):
-        inspector = db.inspect(conn)
-        for table in inspector.get_table_names():
-            id_cols = [col for col in inspector.get_columns(table) if col["name"] == "id"]
-            if id_cols:
-                id_col = id_cols[0]
-                assert id_col["autoincrement"]
-
-    with tempfile.TemporaryDirectory() as tempdir:
-        with open(
-            file_relative_path(__file__, "dagster.yaml"), "r", encoding="utf8"
-        ) as template_fd:
-            with open(os.path.join(tempdir, "dagster.yaml"), "w", encoding="utf8") as target_fd:
-                template = template_fd.read().format(hostname=hostname, port=port)
-                target_fd.write(template)
-
-        with DagsterInstance.from_config(tempdir) as instance:
-            with instance.run_storage.connect() as conn:
-                assert len(_get_integer_id_tables(conn)) > 0
-                _assert_autoincrement_id(conn)
-            with instance.event_log_storage.index_connection() as conn:
-                assert len(_get_integer_id_tables(conn)) > 0
-                _assert_autoincrement_id(conn)
-            with instance.schedule_storage.connect() as conn:
-                assert len(_get_integer_id_tables(conn)) > 0
-                _assert_autoincrement_id(conn)
-
-            run_bigint_migration(instance)
-
-            with instance.run_storage.connect() as conn:
-                assert len(_get_integer_id_tables(conn)) == 0
-                _assert_autoincrement_id(conn)
-            with instance.event_log_storage.index_connection() as conn:
-                assert len(_get_integer_id_tables(conn)) == 0
-                _assert_autoincrement_id(conn)
-            with instance.schedule_storage.connect() as conn:
-                assert len(_get_integer_id_tables(conn)) == 0
-                _assert_autoincrement_id(conn)
-
-
-def test_add_backfill_id_column(conn_string):
+        assert not {row[0] for row in conn.execute(db.text(_NON_AUTOINCREMENT_ID_TABLES_QUERY))}
+
+    with DagsterInstance.from_config(dagster_yaml_dir) as instance:
+        with instance.run_storage.connect() as conn:
+            assert len(_get_integer_id_tables(conn)) > 0
+            _assert_autoincrement_id(conn)
+        with instance.event_log_storage.index_connection() as conn:
+            assert len(_get_integer_id_tables(conn)) > 0
+            _assert_autoincrement_id(conn)
+        with instance.schedule_storage.connect() as conn:
+            assert len(_get_integer_id_tables(conn)) > 0
+            _assert_autoincrement_id(conn)
+
+        run_bigint_migration(instance)
+
+        with instance.run_storage.connect() as conn:
+            assert len(_get_integer_id_tables(conn)) == 0
+            _assert_autoincrement_id(conn)
+        with instance.event_log_storage.index_connection() as conn:
+            assert len(_get_integer_id_tables(conn)) == 0
+            _assert_autoincrement_id(conn)
+        with instance.schedule_storage.connect() as conn:
+            assert len(_get_integer_id_tables(conn)) == 0
+            _assert_autoincrement_id(conn)
+
+
+def test_add_backfill_id_column(reconstruct_snapshot, dagster_yaml_dir):
     from dagster._core.storage.runs.schema import RunsTable
 
     new_columns = {"backfill_id"}
+    # sorted, so that the runs below are inserted in run_id index order
+    run_ids = sorted(make_new_run_id() for _ in range(4))
 
-    hostname, port = _reconstruct_from_file(
-        conn_string,
+    reconstruct_snapshot(
         # use an old snapshot, it has the bulk actions table but not the new columns
         file_relative_path(
             __file__, "snapshot_1_8_12_pre_add_backfill_id_column_to_runs_table.sql"
         ),
     )
 
-    with tempfile.TemporaryDirectory() as tempdir:
-        with open(
-            file_relative_path(__file__, "dagster.yaml"), "r", encoding="utf8"
-        ) as template_fd:
-            with open(os.path.join(tempdir, "dagster.yaml"), "w", encoding="utf8") as target_fd:
-                template = template_fd.read().format(hostname=hostname, port=port)
-                target_fd.write(template)
-
-        with DagsterInstance.from_config(tempdir) as instance:
-            assert get_columns(instance, "runs") & new_columns == set()
-
-            # these runs won't have an entry for backfill_id until after the data migration
-            run_not_in_backfill_pre_migration = instance.run_storage.add_run(
-                DagsterRun(
-                    job_name="first_job_no_backfill",
-                    run_id=make_new_run_id(),
-                    tags=None,
-                    status=DagsterRunStatus.NOT_STARTED,
-                )
+    with DagsterInstance.from_config(dagster_yaml_dir) as instance:
+        assert get_columns(instance, "runs") & new_columns == set()
+
+        # these runs won't have an entry for backfill_id until after the data migration
+        run_not_in_backfill_pre_migration = instance.run_storage.add_run(
+            DagsterRun(
+                job_name="first_job_no_backfill",
+                run_id=run_ids[0],
+                tags=None,
+                status=DagsterRunStatus.NOT_STARTED,
             )
-            run_in_backfill_pre_migration = instance.run_storage.add_run(
-                DagsterRun(
-                    job_name="first_job_in_backfill",
-                    run_id=make_new_run_id(),
-                    tags={BACKFILL_ID_TAG: "backfillid"},
-                    status=DagsterRunStatus.NOT_STARTED,
-                )
+        )
+        run_in_backfill_pre_migration = instance.run_storage.add_run(
+            DagsterRun(
+                job_name="first_job_in_backfill",
+                run_id=run_ids[1],
+                tags={BACKFILL_ID_TAG: "backfillid"},
+                status=DagsterRunStatus.NOT_STARTED,
             )
+        )
 
-            # exclude_subruns filter works before migration
-            assert len(instance.get_runs(filters=RunsFilter(exclude_subruns=True))) == 2
+        # exclude_subruns filter works before migration
+        assert len(instance.get_runs(filters=RunsFilter(exclude_subruns=True))) == 2
 
-            instance.upgrade()
-            assert instance.run_storage.has_built_index(RUN_BACKFILL_ID)
-            assert new_columns <= get_columns(instance, "runs")
-
-            run_not_in_backfill_post_migration = instance.run_storage.add_run(
-                DagsterRun(
-                    job_name="second_job_no_backfill",
-                    run_id=make_new_run_id(),
-                    tags=None,
-                    status=DagsterRunStatus.NOT_STARTED,
-                )
+        instance.upgrade()
+        assert instance.run_storage.has_built_index(RUN_BACKFILL_ID)
+        assert new_columns <= get_columns(instance, "runs")
+
+        run_not_in_backfill_post_migration = instance.run_storage.add_run(
+            DagsterRun(
+                job_name="second_job_no_backfill",
+                run_id=run_ids[2],
+                tags=None,
+                status=DagsterRunStatus.NOT_STARTED,
             )
-            run_in_backfill_post_migration = instance.run_storage.add_run(
-                DagsterRun(
-                    job_name="second_job_in_backfill",
-                    run_id=make_new_run_id(),
-                    tags={BACKFILL_ID_TAG: "backfillid"},
-                    status=DagsterRunStatus.NOT_STARTED,
-                )
+        )
+        run_in_backfill_post_migration = instance.run_storage.add_run(
+            DagsterRun(
+                job_name="second_job_in_backfill",
+                run_id=run_ids[3],
+                tags={BACKFILL_ID_TAG: "backfillid"},
+                status=DagsterRunStatus.NOT_STARTED,
             )
+        )
 
-            backfill_ids = {
-                row["run_id"]: row["backfill_id"]
-                for row in instance._run_storage.fetchall(
-                    db_select([RunsTable.c.run_id, RunsTable.c.backfill_id]).select_from(RunsTable)
-                )
-            }
-            assert backfill_ids[run_not_in_backfill_pre_migration.run_id] is None
-            assert backfill_ids[run_in_backfill_pre_migration.run_id] == "backfillid"
-            assert backfill_ids[run_not_in_backfill_post_migration.run_id] is None
-            assert backfill_ids[run_in_backfill_post_migration.run_id] == "backfillid"
-            # exclude_subruns filter works after migration, but should use new column
-            assert len(instance.get_runs(filters=RunsFilter(exclude_subruns=True))) == 3
-
-
-def test_add_runs_by_backfill_id_idx(conn_string):
-    hostname, port = _reconstruct_from_file(
-        conn_string,
-        file_relative_path(
-            __file__, "snapshot_1_8_12_pre_add_backfill_id_column_to_runs_table.sql"
-        ),
-    )
-
-    with tempfile.TemporaryDirectory() as tempdir:
-        with open(
-            file_relative_path(__file__, "dagster.yaml"), "r", encoding="utf8"
-        ) as template_fd:
-            with open(os.path.join(tempdir, "dagster.yaml"), "w", encoding="utf8") as target_fd:
-                template = template_fd.read().format(hostname=hostname, port=port)
-                target_fd.write(template)
-
-        with DagsterInstance.from_config(tempdir) as instance:
-            assert get_indexes(instance, "runs") & {"idx_runs_by_backfill_id"} == set()
-            instance.upgrade()
-            assert {"idx_runs_by_backfill_id"} <= get_indexes(instance, "runs")
+        backfill_ids = {
+            row["run_id"]: row["backfill_id"]
+            for row in instance._run_storage.fetchall(
+                db_select([RunsTable.c.run_id, RunsTable.c.backfill_id]).select_from(RunsTable)
+            )
+        }
+        assert backfill_ids[run_not_in_backfill_pre_migration.run_id] is None
+        assert backfill_ids[run_in_backfill_pre_migration.run_id] == "backfillid"
+        assert backfill_ids[run_not_in_backfill_post_migration.run_id] is None
+        assert backfill_ids[run_in_backfill_post_migration.run_id] == "backfillid"
+        # exclude_subruns filter works after migration, but should use new column
+        assert len(instance.get_runs(filters=RunsFilter(exclude_subruns=True))) == 3
 
 
-def test_add_backfill_tags(conn_string):
+def test_add_backfill_tags(reconstruct_snapshot, dagster_yaml_dir):
     from dagster._core.storage.runs.schema import BackfillTagsTable
 
-    hostname, port = _reconstruct_from_file(
-        conn_string,
+    reconstruct_snapshot(
         # use an old snapshot, it has the bulk actions table but not the new columns
         file_relative_path(
             __file__, "snapshot_1_8_12_pre_add_backfill_id_column_to_runs_table.sql"
         ),
     )
 
-    with tempfile.TemporaryDirectory() as tempdir:
-        with open(
-            file_relative_path(__file__, "dagster.yaml"), "r", encoding="utf8"
-        ) as template_fd:
-            with open(os.path.join(tempdir, "dagster.yaml"), "w", encoding="utf8") as target_fd:
-                template = template_fd.read().format(hostname=hostname, port=port)
-                target_fd.write(template)
-
-        with DagsterInstance.from_config(tempdir) as instance:
-            assert "backfill_tags" not in get_tables(instance)
-            before_migration = PartitionBackfill(
-                "before_tag_migration",
-                serialized_asset_backfill_data="foo",
-                status=BulkActionStatus.REQUESTED,
-                from_failure=False,
-                tags={"before": "migration"},
-                backfill_timestamp=get_current_timestamp(),
-            )
-            instance.add_backfill(before_migration)
-            # filtering pre-migration relies on filtering runs, so add a run with the expected tags
-            pre_migration_run = instance.run_storage.add_run(
-                DagsterRun(
-                    job_name="foo",
-                    run_id=make_new_run_id(),
-                    tags={"before": "migration", BACKFILL_ID_TAG: before_migration.backfill_id},
-                    status=DagsterRunStatus.NOT_STARTED,
-                )
+    with DagsterInstance.from_config(dagster_yaml_dir) as instance:
+        assert "backfill_tags" not in get_tables(instance)
+        before_migration = PartitionBackfill(
+            "before_tag_migration",
+            serialized_asset_backfill_data="foo",
+            status=BulkActionStatus.REQUESTED,
+            from_failure=False,
+            tags={"before": "migration"},
+            backfill_timestamp=get_current_timestamp(),
+        )
+        instance.add_backfill(before_migration)
+        # filtering pre-migration relies on filtering runs, so add a run with the expected tags
+        pre_migration_run = instance.run_storage.add_run(
+            DagsterRun(
+                job_name="foo",
+                run_id=make_new_run_id(),
+                tags={"before": "migration", BACKFILL_ID_TAG: before_migration.backfill_id},
+                status=DagsterRunStatus.NOT_STARTED,
             )
+        )
+
+        # filtering by tags works before migration
+        assert (
+            instance.get_backfills(filters=BulkActionsFilter(tags={"before": "migration"}))[
+                0
+            ].backfill_id
+            == before_migration.backfill_id
+        )
 
-            # filtering by tags works before migration
+        instance.upgrade()
+        assert "backfill_tags" in get_tables(instance)
+
+        after_migration = PartitionBackfill(
+            "after_tag_migration",
+            serialized_asset_backfill_data="foo",
+            status=BulkActionStatus.REQUESTED,
+            from_failure=False,
+            tags={"after": "migration"},
+            backfill_timestamp=get_current_timestamp(),
+        )
+        instance.add_backfill(after_migration)
+
+        with instance.run_storage.connect() as conn:
+            rows = conn.execute(
+                db_select(
+                    [
+                        BackfillTagsTable.c.backfill_id,
+                        BackfillTagsTable.c.key,
+                        BackfillTagsTable.c.value,
+                    ]
+                )
+            ).fetchall()
+            assert len(rows) == 2
+            ids_to_tags = {row[0]: {row[1]: row[2]} for row in rows}
+            assert ids_to_tags.get(before_migration.backfill_id) == before_migration.tags
+            assert ids_to_tags[after_migration.backfill_id] == after_migration.tags
+
+            # filtering by tags works after migration
+            assert instance.run_storage.has_built_index(BACKFILL_JOB_NAME_AND_TAGS)
+            # delete the run that was added pre-migration to prove that tags filtering is happening on the
+            # backfill_tags table
+            instance.delete_run(pre_migration_run.run_id)
             assert (
                 instance.get_backfills(filters=BulkActionsFilter(tags={"before": "migration"}))[
                     0
                 ].backfill_id
                 == before_migration.backfill_id
             )
-
-            instance.upgrade()
-            assert "backfill_tags" in get_tables(instance)
-
-            after_migration = PartitionBackfill(
-                "after_tag_migration",
-                serialized_asset_backfill_data="foo",
-                status=BulkActionStatus.REQUESTED,
-                from_failure=False,
-                tags={"after": "migration"},
-                backfill_timestamp=get_current_timestamp(),
+            assert (
+                instance.get_backfills(filters=BulkActionsFilter(tags={"after": "migration"}))[
+                    0
+                ].backfill_id
+                == after_migration.backfill_id
             )
-            instance.add_backfill(after_migration)
-
-            with instance.run_storage.connect() as conn:
-                rows = conn.execute(
-                    db_select(
-                        [
-                            BackfillTagsTable.c.backfill_id,
-                            BackfillTagsTable.c.key,
-                            BackfillTagsTable.c.value,
-                        ]
-                    )
-                ).fetchall()
-                assert len(rows) == 2
-                ids_to_tags = {row[0]: {row[1]: row[2]} for row in rows}
-                assert ids_to_tags.get(before_migration.backfill_id) == before_migration.tags
-                assert ids_to_tags[after_migration.backfill_id] == after_migration.tags
-
-                # filtering by tags works after migration
-                assert instance.run_storage.has_built_index(BACKFILL_JOB_NAME_AND_TAGS)
-                # delete the run that was added pre-migration to prove that tags filtering is happening on the
-                # backfill_tags table
-                instance.delete_run(pre_migration_run.run_id)
-                assert (
-                    instance.get_backfills(filters=BulkActionsFilter(tags={"before": "migration"}))[
-                        0
-                    ].backfill_id
-                    == before_migration.backfill_id
-                )
-                assert (
-                    instance.get_backfills(filters=BulkActionsFilter(tags={"after": "migration"}))[
-                        0
-                    ].backfill_id
-                    == after_migration.backfill_id
-                )
 
 
-def test_add_bulk_actions_job_name_column(conn_string):
+def test_add_bulk_actions_job_name_column(reconstruct_snapshot, dagster_yaml_dir):
     from dagster._core.remote_representation.origin import (
         GrpcServerCodeLocationOrigin,
         RemotePartitionSetOrigin,
@@ -689,136 +611,130 @@ def test_add_bulk_actions_job_name_column(conn_string):
     )
     from dagster._core.storage.runs.schema import BulkActionsTable
 
-    hostname, port = _reconstruct_from_file(
-        conn_string,
+    reconstruct_snapshot(
         # use an old snapshot, it has the bulk actions table but not the new columns
         file_relative_path(
             __file__, "snapshot_1_8_12_pre_add_backfill_id_column_to_runs_table.sql"
         ),
     )
-    with tempfile.TemporaryDirectory() as tempdir:
-        with open(
-            file_relative_path(__file__, "dagster.yaml"), "r", encoding="utf8"
-        ) as template_fd:
-            with open(os.path.join(tempdir, "dagster.yaml"), "w", encoding="utf8") as target_fd:
-                template = template_fd.read().format(hostname=hostname, port=port)
-                target_fd.write(template)
-
-        with DagsterInstance.from_config(tempdir) as instance:
-            assert "job_name" not in get_columns(instance, "bulk_actions")
-            partition_set_origin = RemotePartitionSetOrigin(
-                repository_origin=RemoteRepositoryOrigin(
-                    code_location_origin=GrpcServerCodeLocationOrigin(
-                        host="localhost", port=1234, location_name="test_location"
-                    ),
-                    repository_name="the_repo",
+    with DagsterInstance.from_config(dagster_yaml_dir) as instance:
+        assert "job_name" not in get_columns(instance, "bulk_actions")
+        partition_set_origin = RemotePartitionSetOrigin(
+            repository_origin=RemoteRepositoryOrigin(
+                code_location_origin=GrpcServerCodeLocationOrigin(
+                    host="localhost", port=1234, location_name="test_location"
                 ),
-                partition_set_name=partition_set_snap_name_for_job_name("before_migration"),
-            )
-            before_migration = PartitionBackfill(
-                "before_migration",
-                partition_set_origin=partition_set_origin,
-                status=BulkActionStatus.REQUESTED,
-                from_failure=False,
-                tags={},
-                backfill_timestamp=get_current_timestamp(),
-            )
-            instance.add_backfill(before_migration)
-            # filtering pre-migration relies on filtering runs, so add a run with the expected job_name
-            pre_migration_run = instance.run_storage.add_run(
-                DagsterRun(
-                    job_name=before_migration.job_name,
-                    run_id=make_new_run_id(),
-                    tags={BACKFILL_ID_TAG: before_migration.backfill_id},
-                    status=DagsterRunStatus.NOT_STARTED,
-                )
+                repository_name="the_repo",
+            ),
+            partition_set_name=partition_set_snap_name_for_job_name("before_migration"),
+        )
+        before_migration = PartitionBackfill(
+            "before_migration",
+            partition_set_origin=partition_set_origin,
+            status=BulkActionStatus.REQUESTED,
+            from_failure=False,
+            tags={},
+            backfill_timestamp=get_current_timestamp(),
+        )
+        instance.add_backfill(before_migration)
+        # filtering pre-migration relies on filtering runs, so add a run with the expected job_name
+        pre_migration_run = instance.run_storage.add_run(
+            DagsterRun(
+                job_name=before_migration.job_name,
+                run_id=make_new_run_id(),
+                tags={BACKFILL_ID_TAG: before_migration.backfill_id},
+                status=DagsterRunStatus.NOT_STARTED,
             )
+        )
+
+        # filtering by job_name works before migration
+        assert (
+            instance.get_backfills(filters=BulkActionsFilter(job_name=before_migration.job_name))[
+                0
+            ].backfill_id
+            == before_migration.backfill_id
+        )
 
-            # filtering by job_name works before migration
+        instance.upgrade()
+
+        assert "job_name" in get_columns(instance, "bulk_actions")
+
+        partition_set_origin = RemotePartitionSetOrigin(
+            repository_origin=RemoteRepositoryOrigin(
+                code_location_origin=GrpcServerCodeLocationOrigin(
+                    host="localhost", port=1234, location_name="test_location"
+                ),
+                repository_name="the_repo",
+            ),
+            partition_set_name=partition_set_snap_name_for_job_name("after_migration"),
+        )
+        after_migration = PartitionBackfill(
+            "after_migration",
+            partition_set_origin=partition_set_origin,
+            status=BulkActionStatus.REQUESTED,
+            from_failure=False,
+            tags={},
+            backfill_timestamp=get_current_timestamp(),
+        )
+        instance.add_backfill(after_migration)
+
+        with instance.run_storage.connect() as conn:
+            rows = conn.execute(
+                db_select([BulkActionsTable.c.key, BulkActionsTable.c.job_name])
+            ).fetchall()
+            assert len(rows) == 2
+            ids_to_job_name = {row[0]: row[1] for row in rows}
+            assert ids_to_job_name[before_migration.backfill_id] == before_migration.job_name
+            assert ids_to_job_name[after_migration.backfill_id] == after_migration.job_name
+
+            # filtering by job_name works after migration
+            assert instance.run_storage.has_built_index(BACKFILL_JOB_NAME_AND_TAGS)
+            # delete the run that was added pre-migration to prove that tags filtering is happening on the
+            # backfill_tags table
+            instance.delete_run(pre_migration_run.run_id)
             assert (
                 instance.get_backfills(
                     filters=BulkActionsFilter(job_name=before_migration.job_name)
                 )[0].backfill_id
                 == before_migration.backfill_id
             )
-
-            instance.upgrade()
-
-            assert "job_name" in get_columns(instance, "bulk_actions")
-
-            partition_set_origin = RemotePartitionSetOrigin(
-                repository_origin=RemoteRepositoryOrigin(
-                    code_location_origin=GrpcServerCodeLocationOrigin(
-                        host="localhost", port=1234, location_name="test_location"
-                    ),
-                    repository_name="the_repo",
-                ),
-                partition_set_name=partition_set_snap_name_for_job_name("after_migration"),
-            )
-            after_migration = PartitionBackfill(
-                "after_migration",
-                partition_set_origin=partition_set_origin,
-                status=BulkActionStatus.REQUESTED,
-                from_failure=False,
-                tags={},
-                backfill_timestamp=get_current_timestamp(),
+            assert (
+                instance.get_backfills(
+                    filters=BulkActionsFilter(job_name=after_migration.job_name)
+                )[0].backfill_id
+                == after_migration.backfill_id
             )
-            instance.add_backfill(after_migration)
-
-            with instance.run_storage.connect() as conn:
-                rows = conn.execute(
-                    db_select([BulkActionsTable.c.key, BulkActionsTable.c.job_name])
-                ).fetchall()
-                assert len(rows) == 2
-                ids_to_job_name = {row[0]: row[1] for row in rows}
-                assert ids_to_job_name[before_migration.backfill_id] == before_migration.job_name
-                assert ids_to_job_name[after_migration.backfill_id] == after_migration.job_name
-
-                # filtering by job_name works after migration
-                assert instance.run_storage.has_built_index(BACKFILL_JOB_NAME_AND_TAGS)
-                # delete the run that was added pre-migration to prove that tags filtering is happening on the
-                # backfill_tags table
-                instance.delete_run(pre_migration_run.run_id)
-                assert (
-                    instance.get_backfills(
-                        filters=BulkActionsFilter(job_name=before_migration.job_name)
-                    )[0].backfill_id
-                    == before_migration.backfill_id
-                )
-                assert (
-                    instance.get_backfills(
-                        filters=BulkActionsFilter(job_name=after_migration.job_name)
-                    )[0].backfill_id
-                    == after_migration.backfill_id
-                )
 
 
-def test_add_run_tags_run_id_idx(conn_string):
-    hostname, port = _reconstruct_from_file(
-        conn_string,
-        # use an old snapshot, it has the bulk actions table but not the new columns
-        file_relative_path(
-            __file__, "snapshot_1_8_12_pre_add_backfill_id_column_to_runs_table.sql"
-        ),
-    )
-
-    with tempfile.TemporaryDirectory() as tempdir:
-        with open(
-            file_relative_path(__file__, "dagster.yaml"), "r", encoding="utf8"
-        ) as template_fd:
-            with open(os.path.join(tempdir, "dagster.yaml"), "w", encoding="utf8") as target_fd:
-                template = template_fd.read().format(hostname=hostname, port=port)
-                target_fd.write(template)
-
-        with DagsterInstance.from_config(tempdir) as instance:
-            # Before migration
-            assert "run_tags" in get_tables(instance)
-            assert "idx_run_tags" in get_indexes(instance, "run_tags")
-            assert "idx_run_tags_run_id" not in get_indexes(instance, "run_tags")
-
-            # After upgrade
-            instance.upgrade()
-
-            assert "run_tags" in get_tables(instance)
-            assert "idx_run_tags" not in get_indexes(instance, "run_tags")
-            assert "idx_run_tags_run_id" in get_indexes(instance, "run_tags")
+# the first line of each kind of statement a snapshot dump may contain, replayed or skipped
+_STATEMENT_START = re.compile(
+    rb"^(CREATE TABLE |INSERT INTO |DROP TABLE |LOCK TABLES |UNLOCK TABLES|/\*!|DELIMITER )"
+)
+_VERSIONED_SET = re.compile(rb"^/\*!\d+ SET .*\*/$")
+
+
+@pytest.mark.parametrize(
+    "snapshot_path",
+    sorted(glob.glob(file_relative_path(__file__, "snapshot_*.sql"))),
+    ids=os.path.basename,
+)
+def test_snapshot_dump_statements(snapshot_path):
+    with open(snapshot_path, "rb") as dump:
+        statements = [
+            statement
+            for statement in _read_statements(dump)
+            if not statement.startswith(_NO_OP_STATEMENT_PREFIXES)
+        ]
+
+    assert any(statement.startswith(b"CREATE TABLE ") for statement in statements)
+    for statement in statements:
+        lines = statement.split(b"\n")
+        # a statement merged with the one after it would contain that statement's first line
+        assert not any(_STATEMENT_START.match(line) for line in lines[1:]), lines[0]
+        if statement.startswith(b"/*!"):
+            assert _VERSIONED_SET.match(statement), statement
+        elif statement.startswith(b"INSERT INTO "):
+            # mysqldump writes each (extended) insert on a single line
+            assert len(lines) == 1, lines[0]
+        else:
+            assert statement.startswith(b"CREATE TABLE "), lines[0]